@@ -1,15 +1,37 @@
 # === Import libraries ===
 import asyncio
-import base64
-import json
+import logging
+import multiprocessing
+import orjson
 import re
+import time
 import websockets
 
 # === Import packages ===
 from datetime import datetime
 from datetime import UTC
 from pathlib import Path
-from collections import OrderedDict
+from typing import Any
+
+# === Optional packages ===
+try:
+    from pybase64 import b64decode as _b64decode
+except ImportError:
+    from base64 import b64decode as _b64decode  # type: ignore[assignment]
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None  # type: ignore[assignment]
+
+# === Logger ===
+logger = logging.getLogger(__name__)
+
+# === Constants ===
+DATAPREFIX = "Program data:"
+DATAPREFIXLEN = len(DATAPREFIX)
+SEENTXIDSMAX = 10_000
+SHARDSIZE = 7
 
 
 # === Class 'SolDexLogs' ===
@@ -23,56 +45,158 @@ class SolDexLogs:
     Parameters:
     - progids (dict): A dictionary mapping known Solana program IDs (str) to their associated DEX names (str).
     - outputfile (str): The path of the file to store the matched logs. Defaults to "dexlog.json".
+    - storehex (bool): Whether to also store the hex representation of the decoded data. Defaults to False.
+    - mentions (bool): Whether to subscribe only to logs mentioning the known program IDs. Defaults to False.
 
     Returns:
     - None
     """
 
     # === Function '__init__' ===
-    def __init__(self, progids: dict, outputfile: str = "dexlog.json"):
+    def __init__(
+        self,
+        progids: dict[str, str],
+        outputfile: str = "dexlog.json",
+        storehex: bool = False,
+        mentions: bool = False
+    ) -> None:
         """
-        This initializer sets up internal data structures and compiles a regex pattern for identifying
-        log lines corresponding to Solana program invocations. It processes and stores the list of known
-        DEX-related program IDs, prepares the output file path for writing, and initializes the pattern
-        used for extracting program IDs from log lines. The setup is essential before the WebSocket log
-        subscription begins.
+        This initializer sets up internal data structures used for identifying log lines corresponding
+        to Solana program invocations. It processes and stores the list of known DEX-related program IDs,
+        compiles a pattern that only matches invocations of those programs, opens the output file once
+        in buffered binary append mode, prepares the bounded queue drained by the background writer,
+        and records whether decoded payloads should also be stored as hex. The setup is essential before
+        the WebSocket log subscription begins.
 
         Parameters:
         - progids (dict): A mapping from Solana program IDs (str) to DEX names (str) for filtering.
         - outputfile (str): A string path to the file where logs will be appended. Defaults to "dexlog.json".
+        - storehex (bool): If True, each entry also carries the decoded payload as a hex string. Defaults to False.
+        - mentions (bool): If True, `run` opens one filtered subscription per program ID. Defaults to False.
 
         Returns:
         - None
         """
         self.programids = {k.strip(): v for k, v in progids.items()}
+        self.invokepattern = re.compile(
+            r"Program (" + "|".join(map(re.escape, self.programids)) + r") invoke"
+        )
         self.outputfile = Path(outputfile)
-        self.logpattern = re.compile(r"Program (\w{32,}) invoke")
+        self.filehandle = self.outputfile.open("ab", buffering=1024 * 1024)
+        self.writequeue: asyncio.Queue[bytes] = asyncio.Queue(maxsize=10_000)
+        self.writertask: asyncio.Task[None] | None = None
+        self.storehex = storehex
+        self.mentions = mentions
+        self.seentxids: dict[str, None] = {}
+        self.timestampcache: tuple[int, str] = (0, "")
 
     # === Function 'savelog' ===
-    def savelog(self, entry: OrderedDict):
+    async def savelog(self, entry: dict[str, Any]) -> None:
+        """
+        This function serializes a decoded and formatted log entry to a newline-terminated JSON line
+        with orjson in a single buffer and hands it to the background writer through the bounded write
+        queue, so that entries are written in batches and the file syscalls are amortized. The writer
+        still runs on the event loop thread, so each batch write briefly pauses the receive loop. When
+        the queue is full it waits for the writer to catch up, applying backpressure instead of
+        dropping entries. This function is only triggered when a matching DEX log is found and
+        successfully parsed.
+
+        Parameters:
+        - entry (dict): A dictionary containing timestamped, decoded log data related to a specific DEX program activity.
+
+        Returns:
+        - None
+        """
+        await self.writequeue.put(orjson.dumps(entry, option=orjson.OPT_APPEND_NEWLINE))
+
+    # === Function 'writer' ===
+    async def writer(self) -> None:
+        """
+        This function runs as a background task for the lifetime of `run`. It waits for serialized
+        entries on the write queue, collects whatever else is already queued (up to 512 entries) into
+        a single batch, and appends the batch to the output file in one write. The file buffer is
+        flushed whenever the queue has been drained, so entries reach disk promptly when idle. If a
+        write fails, the error is logged, the batch is dropped, and the writer keeps draining the queue.
+
+        Parameters:
+        - None
+
+        Returns:
+        - None
+        """
+        while True:
+            batch: list[bytes] = [await self.writequeue.get()]
+            while not self.writequeue.empty() and len(batch) < 512:
+                batch.append(self.writequeue.get_nowait())
+
+            try:
+                self.filehandle.write(b"".join(batch))
+                if self.writequeue.empty():
+                    self.filehandle.flush()
+            except OSError as e:
+                logger.error("[-] Failed to write %d log entries: %s", len(batch), e)
+
+    # === Function 'close' ===
+    def close(self) -> None:
         """
-        This function appends a decoded and formatted log entry to the output JSON file specified
-        at initialization. It opens the file in append mode, encodes the dictionary as a JSON string,
-        and writes each entry on a new line for easy JSON Lines processing. This function is only
-        triggered when a matching DEX log is found and successfully parsed.
+        This function stops the background writer, writes out any entries still waiting in the write
+        queue, then flushes and closes the output file handle opened at initialization. It is safe to
+        call more than once and is invoked automatically when `run` exits, so that queued or buffered
+        entries are not lost on shutdown or cancellation.
 
         Parameters:
-        - entry (OrderedDict): A dictionary-like object containing timestamped, decoded log data related to a specific DEX program activity.
+        - None
 
         Returns:
         - None
         """
-        with self.outputfile.open("a", encoding="utf-8") as f:
-            f.write(json.dumps(entry) + "\n")
+        if self.writertask is not None:
+            self.writertask.cancel()
+            self.writertask = None
+
+        if self.filehandle.closed:
+            return
+
+        batch: list[bytes] = []
+        while not self.writequeue.empty():
+            batch.append(self.writequeue.get_nowait())
+
+        self.filehandle.write(b"".join(batch))
+
+        self.filehandle.flush()
+        self.filehandle.close()
+
+    # === Function 'gettimestamp' ===
+    def gettimestamp(self) -> str:
+        """
+        This function returns the current UTC time as an ISO 8601 string with microsecond precision.
+        Unlike `datetime.isoformat()`, the six-digit fraction is always present, even when the
+        microsecond value is 0. The formatted date and time up to the second is cached and only rebuilt
+        when the second changes, so most calls only append the microseconds instead of constructing and
+        formatting a new datetime object.
+
+        Parameters:
+        - None
+
+        Returns:
+        - str: The current UTC timestamp, e.g. "2025-06-14T18:33:31.563657+00:00".
+        """
+        sec, nsec = divmod(time.time_ns(), 1_000_000_000)
+        if sec != self.timestampcache[0]:
+            prefix = datetime.fromtimestamp(sec, UTC).strftime("%Y-%m-%dT%H:%M:%S")
+            self.timestampcache = (sec, prefix)
+
+        return f"{self.timestampcache[1]}.{nsec // 1000:06d}+00:00"
 
     # === Function 'handler' ===
-    async def handler(self, message: dict):
+    async def handler(self, message: dict[str, Any]) -> None:
         """
         Handles incoming WebSocket messages from the Solana logs feed. Filters non-log messages,
         extracts the transaction signature, matches program invocations, and identifies logs with
-        base64-encoded payloads. For each matching log, it decodes the data, extracts hex values,
-        computes the binary size, builds a structured dictionary of information, and saves the result
-        using `savelog`.
+        base64-encoded payloads. Each payload is decoded once per notification, with its binary size
+        and optional hex value, and then shared by every matched program. For each matching program
+        and payload, it builds a structured dictionary of information and saves the result using
+        `savelog`.
 
         Parameters:
         - message (dict): The incoming WebSocket message dictionary containing log notifications and transaction details.
@@ -83,53 +207,71 @@ class SolDexLogs:
         if message.get("method") != "logsNotification":
             return
 
-        resp = message["params"]["result"]
-        txid = resp.get("value", {}).get("signature", "")
-        logs = resp.get("value", {}).get("logs", [])
+        value = message["params"]["result"].get("value", {})
+        txid = value.get("signature", "")
+        logs = value.get("logs", [])
 
-        invokedids = {
-            match.group(1) for log in logs
-            if (match := self.logpattern.search(log))
-        }
+        matchedids: set[str] = set()
+        datalines: list[str] = []
+        invokematch = self.invokepattern.match
+        for log in logs:
+            if log.startswith(DATAPREFIX):
+                datalines.append(log[DATAPREFIXLEN:].strip())
+            elif (match := invokematch(log)) is not None:
+                matchedids.add(match.group(1))
+
+        if not datalines or not matchedids:
+            return
 
-        timestamp = datetime.now(UTC).isoformat()
-        for pid in invokedids:
-            if pid not in self.programids:
+        if self.mentions:
+            if txid in self.seentxids:
+                return
+            self.seentxids[txid] = None
+            if len(self.seentxids) > SEENTXIDSMAX:
+                del self.seentxids[next(iter(self.seentxids))]
+
+        payloads: list[tuple[str, int, str | None]] = []
+        for b64data in datalines:
+            try:
+                binary_data = _b64decode(b64data, validate=False)
+            except Exception as e:
+                logger.warning("[-] Base64 decode failed: %s", e)
                 continue
+            hexdata = binary_data.hex() if self.storehex else None
+            payloads.append((b64data, len(binary_data), hexdata))
 
+        timestamp = self.gettimestamp()
+        for pid in matchedids:
             dexname = self.programids[pid]
-            print(f"[+] Matched DEX Program: {dexname} ({pid}) in tx {txid}")
-
-            for log in logs:
-                if log.startswith("Program data:"):
-                    b64data = log.split("Program data:")[-1].strip()
-                    try:
-                        binary_data = base64.b64decode(b64data)
-                        hexdata = binary_data.hex()
-                        hexsize = len(binary_data)
-                    except Exception as e:
-                        print(f"[-] Base64 decode failed: {e}")
-                        continue
-
-                    entry = OrderedDict()
-                    entry["hexsize"] = hexsize
-                    entry["timestamp"] = timestamp
-                    entry["txid"] = txid
-                    entry["programid"] = pid
-                    entry["dexname"] = dexname
-                    entry["base64"] = b64data
+            logger.debug("[+] Matched DEX Program: %s (%s) in tx %s", dexname, pid, txid)
+
+            for b64data, hexsize, hexdata in payloads:
+                entry: dict[str, Any] = {
+                    "hexsize": hexsize,
+                    "timestamp": timestamp,
+                    "txid": txid,
+                    "programid": pid,
+                    "dexname": dexname,
+                    "base64": b64data
+                }
+                if self.storehex:
                     entry["hex"] = hexdata
 
-                    print(f"[✓] Captured {dexname} log from {txid} ({hexsize} bytes)")
-                    self.savelog(entry)
+                logger.debug("[✓] Captured %s log from %s (%d bytes)", dexname, txid, hexsize)
+                await self.savelog(entry)
 
     # === Function 'run' ===
-    async def run(self):
+    async def run(self) -> None:
         """
-        Connects to the Solana mainnet WebSocket endpoint and subscribes to all logs with commitment
-        level 'processed'. Continuously receives log messages, decodes them, and dispatches them to
-        the `handler` function. This function maintains a persistent connection and is intended to
-        be run inside an asyncio event loop for real-time monitoring.
+        Connects to the Solana mainnet WebSocket endpoint without compression and subscribes to all logs
+        with commitment level 'processed', or, in mentions mode, to one filtered subscription per known
+        program ID so that the RPC node drops unrelated transactions server-side. Transactions delivered by
+        several of those subscriptions are only saved once. Continuously receives raw log frames as bytes,
+        skipping the UTF-8 text decoding step, parses them with orjson, and dispatches them to the
+        `handler` function. When the connection drops or cannot be established, it reconnects and
+        resubscribes with an exponential backoff capped at 30 seconds. This function is intended to be run
+        inside an asyncio event loop for real-time monitoring. Matched entries are written by a background
+        `writer` task, and the output file is closed when the loop exits.
 
         Parameters:
         - None
@@ -138,35 +280,92 @@ class SolDexLogs:
         - None
         """
         uri = "wss://api.mainnet-beta.solana.com/"
-        async with websockets.connect(uri) as ws:
-            sub_msg = {
+        filters = [{"mentions": [pid]} for pid in self.programids] if self.mentions else ["all"]
+        sub_msgs = [
+            orjson.dumps({
                 "jsonrpc": "2.0",
-                "id": 1,
+                "id": subid,
                 "method": "logsSubscribe",
                 "params": [
-                    "all",
+                    logfilter,
                     {"commitment": "processed"}
                 ]
-            }
-            await ws.send(json.dumps(sub_msg))
-            print("[*] Subscribed to ALL Solana logs.")
+            }).decode()
+            for subid, logfilter in enumerate(filters, start=1)
+        ]
 
+        self.writertask = asyncio.create_task(self.writer())
+        backoff = 1
+        try:
             while True:
                 try:
-                    raw = await ws.recv()
-                    message = json.loads(raw)
-                    await self.handler(message)
-                except Exception as e:
-                    print(f"[!] WebSocket error: {e}")
-                    
-                    
+                    async with websockets.connect(uri, compression=None, max_size=2**24) as ws:
+                        for sub_msg in sub_msgs:
+                            await ws.send(sub_msg)
+                        if self.mentions:
+                            logger.info("[*] Subscribed to logs mentioning %d programs.", len(sub_msgs))
+                        else:
+                            logger.info("[*] Subscribed to ALL Solana logs.")
+                        backoff = 1
+
+                        while True:
+                            raw = await ws.recv(decode=False)
+                            try:
+                                await self.handler(orjson.loads(raw))
+                            except Exception as e:
+                                logger.error("[!] Failed to handle message: %s", e)
+                except (websockets.WebSocketException, OSError) as e:
+                    logger.error("[!] WebSocket error: %s", e)
+
+                logger.info("[*] Reconnecting in %d seconds.", backoff)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+        finally:
+            self.close()
+
+
+# === Function 'runcollector' ===
+def runcollector(
+    progids: dict[str, str],
+    outputfile: str,
+    mentions: bool = False,
+    storehex: bool = False
+) -> None:
+    """
+    Configures logging and runs a `SolDexLogs` collector for the given program IDs until it is stopped.
+    The collector runs on a uvloop event loop when available, falling back to `asyncio.run` otherwise.
+    This function is the target of each shard process started by the main entry point, and can also
+    be called directly to run a single collector in the current process.
+
+    Parameters:
+    - progids (dict): A mapping from Solana program IDs (str) to DEX names (str) for filtering.
+    - outputfile (str): A string path to the file where logs will be appended.
+    - mentions (bool): Whether to subscribe only to logs mentioning the given program IDs. Defaults to False.
+    - storehex (bool): Whether to also store the hex representation of the decoded data. Defaults to False.
+
+    Returns:
+    - None
+    """
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    collector = SolDexLogs(progids, outputfile=outputfile, storehex=storehex, mentions=mentions)
+    try:
+        if uvloop is not None:
+            uvloop.run(collector.run())
+        else:
+            asyncio.run(collector.run())
+    except KeyboardInterrupt:
+        pass
+
+
 # === Main Callback ===
 if __name__ == "__main__":
     """
     Main execution entry point for the SolDexLogs log monitoring tool. Initializes a dictionary mapping
-    known Solana program IDs to their respective DEX project names and creates an instance of the
-    `SolDexLogs` class. Launches the asynchronous log collector using `asyncio.run`. This script should
-    be run from the command line and will stay active to monitor logs in real-time.
+    known Solana program IDs to their respective DEX project names, splits it into shards of
+    `SHARDSIZE` programs, and starts one process per shard with `runcollector`. Each shard subscribes
+    only to logs mentioning its own programs and writes to its own "dexlog.shard<N>.json" file, so
+    filtering happens server-side and decoding is spread across CPU cores. This script should be run
+    from the command line and will stay active to monitor logs in real-time.
 
     Parameters:
     - None
@@ -205,5 +404,19 @@ if __name__ == "__main__":
         "swapFpHZwjELNnjvThjajtiVmkz3yPQEHjLtka2fwHW": "StableWeight"
     }
 
-    collector = SolDexLogs(programids)
-    asyncio.run(collector.run())
+    items = list(programids.items())
+    shards = [dict(items[i:i + SHARDSIZE]) for i in range(0, len(items), SHARDSIZE)]
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=runcollector, args=(shard, f"dexlog.shard{n}.json", True))
+        for n, shard in enumerate(shards)
+    ]
+
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join()